@@ -2,51 +2,65 @@
 
 import subprocess
 import time
-from typing import Tuple
+from typing import List, Tuple
 import configparser
 import os
 import re
+import shlex
+import select
 import logging
 from logging.handlers import RotatingFileHandler
 import sys
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 import paramiko as pm
 
 CONFIG_FILE_NAME="gpu_checker_config.ini"
 LOG = None # init_logger()
 SLURM_GPU_COUNTS = dict() # init_gpu_counts()
+SSH_CLIENTS = dict() # get_ssh_client()
+RECV_CHUNK_BYTES = 32768 # _SSHClient._exec_command()
+TRUE_STRINGS = frozenset(['true', '1', 't', 'y', 'yes']) # str_to_bool()
+FALSE_STRINGS = frozenset(['false', '0', 'f', 'n', 'no']) # str_to_bool()
 
 
-def shell_command(command: str, timeout_s: int, shell="/bin/bash") -> Tuple[str, str]:
+class CommandReport:
     """
+    command, return code, stdout, stderr
+    only formatted into a string when str() is called, since most reports are never read
+    """
+    def __init__(self, argv: List[str], returncode: int, stdout: str, stderr: str):
+        self.argv = argv
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+
+    def __str__(self) -> str:
+        return multiline_str(
+            "command:",
+            indent(shlex.join(self.argv)),
+            f"return code: {self.returncode}",
+            "stdout:",
+            indent(self.stdout),
+            "stderr:",
+            indent(self.stderr)
+        )
+
+def run_command(argv: List[str], timeout_s: int, stdin=None) -> Tuple[str, CommandReport]:
+    """
+    runs argv directly (no shell in between, so no pipes or globs either)
     returns stdout and a full report containing command, return code, stdout, stderr
-    will raise RuntimeError contianing the full report if any part of the command fails
+    will raise RuntimeError contianing the full report if the command fails
+    stdin is an optional string to be written to the command's standard input
     """
-    command = "set -e; set -o pipefail; " + command
     try:
-        process = subprocess.run(command, timeout=timeout_s, capture_output=True,
-                                shell=True, check=True, executable=shell, encoding="UTF-8")
-        report = multiline_str(
-                "command:",
-                indent(command),
-                f"return code: {process.returncode}",
-                "stdout:",
-                indent(process.stdout),
-                "stderr:",
-                indent(process.stderr)
-            )
+        process = subprocess.run(argv, timeout=timeout_s, capture_output=True, input=stdin,
+                                check=True, encoding="UTF-8")
+        report = CommandReport(argv, process.returncode, process.stdout, process.stderr)
         return process.stdout.strip(), report
     except subprocess.CalledProcessError as err:
-        fail_report = multiline_str(
-                "command:",
-                indent(command),
-                f"return code: {err.returncode}",
-                "stdout:",
-                indent(err.stdout),
-                "stderr:",
-                indent(err.stderr)
-            )
-        raise RuntimeError(fail_report) from err
+        fail_report = CommandReport(argv, err.returncode, err.stdout, err.stderr)
+        raise RuntimeError(str(fail_report)) from err
 
 def multiline_str(*argv: str) -> str:
     """
@@ -58,32 +72,27 @@ def indent(string: str, indenter="    ", num_indents=1) -> str:
     """
     add the indenter (default four spaces) to the beginning of each line in the string
     """
-    for i in range(num_indents):
-        string = indenter + string # first line
-        string = string.replace(os.linesep, os.linesep+indenter) # all other lines
-    return string
+    prefix = indenter*num_indents
+    # first line, then all other lines in a single pass
+    return prefix + string.replace(os.linesep, os.linesep+prefix)
 
 def remove_empty_lines(string: str) -> str:
     return os.linesep.join([line for line in string.splitlines() if line])
 
-def count_lines(string: str) -> int:
-    return string.count(os.linesep)+1
-
-def purge_element(_list: list, elem_to_purge) -> list:
-    return [elem for elem in _list if elem != elem_to_purge]
-
 def parse_config_list(string: str, lowercase=False) -> list:
     """
     delete newlines, split by commas, strip each string, remove empty strings
     """
     if lowercase:
         string = string.lower()
-    return purge_element([state.strip() for state in string.replace('\n', '').split(',')], '')
+    stripped = (elem.strip() for elem in string.replace('\n', '').split(','))
+    return [elem for elem in stripped if elem]
 
 def str_to_bool(string: str) -> bool:
-    if string.lower() in ['true', '1', 't', 'y', 'yes']:
+    lowercase_string = string.lower()
+    if lowercase_string in TRUE_STRINGS:
         return True
-    if string.lower() in ['false', '0', 'f', 'n', 'no']:
+    if lowercase_string in FALSE_STRINGS:
         return False
     raise RuntimeError(f"Can't convert {string} to boolean")
 
@@ -91,16 +100,82 @@ class _SSHClient(pm.SSHClient):
     """
     same as paramiko.SSHClient but it includes a wrapper function _exec_command
     """
-    def _exec_command(self, *argv, encoding="UTF-8") -> Tuple[int, str, str]:
+    def _exec_command(self, *argv) -> Tuple[int, bytes, bytes]:
         """
         same as exec_command but instead of stdin it returns exit status
-        and stdout/stderr are strings
+        and stdout/stderr are the raw bytes, left for the caller to decode if it needs them
         """
         stdin, stdout, stderr = self.exec_command(*argv)
-        exit_status = stdout.channel.recv_exit_status()
-        stdout = remove_empty_lines(str(stdout.read(), encoding))
-        stderr = remove_empty_lines(str(stderr.read(), encoding))
-        return exit_status, stdout,stderr
+        channel = stdout.channel
+        stdout_chunks = []
+        stderr_chunks = []
+        # drain both streams as the data arrives and only then wait for the exit status
+        # paramiko only reopens the window the streams share as data is read, so leaving either
+        # one unread can hang forever once the output outgrows the channel window
+        while True:
+            # check before reading, any data sent before the eof is already buffered by then
+            done = channel.eof_received or channel.closed
+            received = False
+            if channel.recv_ready():
+                stdout_chunks.append(channel.recv(RECV_CHUNK_BYTES))
+                received = True
+            if channel.recv_stderr_ready():
+                stderr_chunks.append(channel.recv_stderr(RECV_CHUNK_BYTES))
+                received = True
+            if done and not received:
+                break
+            if not received:
+                # the channel is readable when either stream has data or the channel closes
+                select.select([channel], [], [], 1)
+        exit_status = channel.recv_exit_status()
+        return exit_status, b''.join(stdout_chunks), b''.join(stderr_chunks)
+
+def load_private_key(key_filename: str) -> pm.PKey:
+    """
+    read and parse the private key file once, rather than paramiko doing it for every connection
+    raises paramiko.SSHException if the file isn't a key type paramiko understands
+    """
+    for key_class in [pm.RSAKey, pm.ECDSAKey, pm.Ed25519Key]:
+        try:
+            return key_class.from_private_key_file(key_filename)
+        except pm.SSHException:
+            continue
+    raise pm.SSHException(f"unable to load private key from {key_filename}")
+
+def get_ssh_client(node: str, ssh_user: str, pkey: pm.PKey) -> _SSHClient:
+    """
+    returns the open connection to node from SSH_CLIENTS global dict, connecting if there isn't one
+    like ssh ControlMaster, every command after the first gets a new channel over the same
+    authenticated transport instead of paying for another TCP + SSH handshake + auth
+    raises the same exceptions as paramiko.SSHClient.connect
+    """
+    ssh_client = SSH_CLIENTS.pop(node, None)
+    if ssh_client is not None:
+        transport = ssh_client.get_transport()
+        if (transport is not None) and transport.is_active():
+            SSH_CLIENTS[node] = ssh_client
+            return ssh_client
+        ssh_client.close()
+    ssh_client = _SSHClient()
+    ssh_client.set_missing_host_key_policy(pm.MissingHostKeyPolicy()) # do nothing
+    ssh_client.connect(node, username=ssh_user, pkey=pkey)
+    SSH_CLIENTS[node] = ssh_client
+    return ssh_client
+
+def close_ssh_client(node: str) -> None:
+    """
+    close and forget the connection to node, if there is one
+    """
+    ssh_client = SSH_CLIENTS.pop(node, None)
+    if ssh_client is not None:
+        ssh_client.close()
+
+def close_ssh_clients(keep_nodes=frozenset()) -> None:
+    """
+    close and forget every connection except the ones to nodes in keep_nodes
+    """
+    for node in [node for node in SSH_CLIENTS if node not in keep_nodes]:
+        close_ssh_client(node)
 
 def find_slurm_nodes(partitions='', include_nodes=[], exclude_nodes=[]) -> None:
     """"
@@ -110,14 +185,16 @@ def find_slurm_nodes(partitions='', include_nodes=[], exclude_nodes=[]) -> None:
     """
     nodes = include_nodes
     if len(partitions) != 0:
-        command = f"sinfo --partition={partitions} -N --noheader -o '%N' | sort -u"
-        stdout, command_report = shell_command(command, 10)
+        # sinfo -N lists a node once per partition, dict.fromkeys dedupes and keeps the order
+        # which also drops any include_nodes that are already in the partitions
+        command = ["sinfo", f"--partition={partitions}", "-N", "--noheader", "-o", "%N"]
+        stdout, command_report = run_command(command, 10)
         if stdout == "":
-            raise RuntimeError('\n'.join(["empty output from `sinfo`!", command_report]))
+            raise RuntimeError('\n'.join(["empty output from `sinfo`!", str(command_report)]))
         nodes = nodes + [x.lower().strip() for x in stdout.splitlines()]
-        nodes = purge_element(nodes, "")
-        for exclude_node in exclude_nodes:
-            nodes = purge_element(nodes, exclude_node)
+        # one pass over the nodes with constant time lookups, rather than one pass per exclude_node
+        exclude_nodes = set(exclude_nodes)
+        nodes = [node for node in dict.fromkeys(nodes) if node and (node not in exclude_nodes)]
     if len(nodes) == 0:
         raise RuntimeError(multiline_str(
             "found 0 nodes!",
@@ -138,8 +215,8 @@ def do_check_node(node: str, states_to_check: list, states_not_to_check: list,
     do_check = False
     reasons = []
     try:
-        stdout, command_report = shell_command(f"scontrol show node {node}", 10)
-    except subprocess.CalledProcessError as err:
+        stdout, command_report = run_command(["scontrol", "show", "node", node], 10)
+    except RuntimeError as err:
         LOG.error(str(err))
         return False
     # scontrol has states delimited by '+'
@@ -159,7 +236,7 @@ def do_check_node(node: str, states_to_check: list, states_not_to_check: list,
         LOG.info(f"checking node {node}?\t{do_check} because {','.join(reasons)}")
     return do_check
 
-def check_gpu(node: str, ssh_user: str, key_filename: str, timeout_s=0) -> Tuple[bool, str, str]:
+def check_gpu(node: str, ssh_user: str, pkey: pm.PKey, timeout_s=0) -> Tuple[bool, str, str]:
     """
     checks that nvidia-smi works, works in a reasonable amount of time,
     and reports the same number of GPUs that are listed in SLURM_GPU_COUNTS global dict
@@ -169,38 +246,60 @@ def check_gpu(node: str, ssh_user: str, key_filename: str, timeout_s=0) -> Tuple
     returns:
     - boolean of whether the check passed or not
     - short (couple words) summary of what happened
-    - complete report of what happened
+    - complete report of what happened, empty if the check passed
     """
     command = "nvidia-smi -L"
     if timeout_s > 0:
         command = f"timeout -v {timeout_s} " + command
-    ssh_client = _SSHClient()
-    ssh_client.set_missing_host_key_policy(pm.MissingHostKeyPolicy()) # do nothing
     try:
-        ssh_client.connect(node, username=ssh_user, key_filename=key_filename)
-    except (pm.SSHException, pm.AuthenticationException, pm.ChannelException):
+        ssh_client = get_ssh_client(node, ssh_user, pkey)
+        try:
+            exit_code, stdout, stderr = ssh_client._exec_command(command)
+        except (pm.SSHException, EOFError):
+            # the connection can drop any time after get_ssh_client checked it
+            # reconnect once, if that fails too then it's a real connection problem
+            close_ssh_client(node)
+            ssh_client = get_ssh_client(node, ssh_user, pkey)
+            exit_code, stdout, stderr = ssh_client._exec_command(command)
+    except (pm.SSHException, pm.AuthenticationException, pm.ChannelException, EOFError, OSError):
+        # OSError covers the socket errors from connecting to a node that's down or rebooting:
+        # NoValidConnectionsError, ConnectionRefusedError, socket.timeout
         full_report = traceback.format_exc()
         short_summary = "SSH failed to connect"
         #passed = False
 	    # Let slurm decide when a node is down
         passed = True
         return passed, short_summary, full_report
-    exit_code, stdout, stderr = ssh_client._exec_command(command)
-    ssh_client.close()
-    full_report = multiline_str(
-        f"command: {command}",
-        f"exit code: {exit_code}",
-        "stdout:",
-        indent(stdout),
-        '',
-        "stderr:",
-        indent(stderr),
-    )
+    def make_full_report() -> str:
+        # only decode the output when someone is going to read it, healthy nodes never need it
+        return multiline_str(
+            f"command: {command}",
+            f"exit code: {exit_code}",
+            "stdout:",
+            indent(remove_empty_lines(str(stdout, "UTF-8"))),
+            '',
+            "stderr:",
+            indent(remove_empty_lines(str(stderr, "UTF-8"))),
+        )
+    # paramiko's exit status is -1 when the channel closed without sending one. Either the
+    # connection dropped mid command, or the command was killed by a signal (sshd sends
+    # exit-signal instead, which paramiko ignores). Only a dropped connection isn't nvidia-smi's
+    # fault, so only then let slurm decide when a node is down
+    transport = ssh_client.get_transport()
+    if (exit_code == -1) and ((transport is None) or (not transport.is_active())):
+        close_ssh_client(node)
+        passed = True
+        short_summary = "SSH connection lost"
+        return passed, short_summary, make_full_report()
     short_summary = f"nvidia-smi returned {exit_code}"
     passed = (exit_code == 0)
 
-    num_gpus_found = count_lines(stdout)
+    # `nvidia-smi -L` prints one line per GPU, count them without decoding
+    num_gpus_found = len([line for line in stdout.splitlines() if line])
     num_gpus_expected = SLURM_GPU_COUNTS[node]
+    if passed and (num_gpus_found == num_gpus_expected):
+        return passed, short_summary, ""
+    full_report = make_full_report()
     if passed & (num_gpus_found != num_gpus_expected):
         num_gpus_report = multiline_str(
             f"number of GPUs counted: {num_gpus_found}",
@@ -209,29 +308,46 @@ def check_gpu(node: str, ssh_user: str, key_filename: str, timeout_s=0) -> Tuple
         short_summary = "wrong number of GPUs"
         full_report = full_report + '\n' + num_gpus_report
         passed = False
-    if "Unable to determine the device handle for gpu" in stdout:
+    if b"Unable to determine the device handle for gpu" in stdout:
         short_summary = "nvidia-smi device handle error"
-    if "timeout" in stderr:
+    # `timeout` exits 124 when it had to kill the command
+    if (timeout_s > 0) and (exit_code == 124):
         short_summary = "nvidia-smi timeout"
 
     return passed, short_summary, full_report
 
+def drain_nodes(nodes: List[str], reason: str) -> Tuple[bool, str]:
+    """
+    drain all of the nodes with a single scontrol call
+    returns whether the drain worked and the command report
+    """
+    command = ["scontrol", "update", f"nodename={','.join(nodes)}", "state=drain",
+               f"reason={reason}"]
+    try:
+        stdout, drain_report = run_command(command, 10)
+        return True, str(drain_report)
+    except RuntimeError as err:
+        return False, str(err)
+
 def send_email(recipient: str, _from: str, subject: str, body: str, signature: str) -> None:
+    message = multiline_str(
+        f"From: {_from}",
+        f"Subject: {subject}",
+        "",
+        body,
+        signature
+    )
     LOG.info(multiline_str(
         "sending email:_______________________________________________________________",
         f"to: {recipient}",
-        f"from: {_from}",
-        f"subject: {subject}",
-        "body:",
-        body,
-        "",
-        signature
+        message
     ))
-    body = body.replace('\n', "\\n")
-    signature = signature.replace('\n', "\\n")
-    cmd = f"echo -e \"From: {_from}\\nSubject :{subject}\\n\\n{body}\\n{signature}\" |\
-        /usr/sbin/sendmail -f {_from} {recipient}"
-    shell_command(cmd, 30)
+    # sendmail hands the message to the local MTA, which takes care of queueing and reusing
+    # SMTP connections, so there's no handshake to pay for here
+    # writing to its stdin directly means no echo process and no escaping the body
+    # recipient can be several space separated addresses
+    cmd = ["/usr/sbin/sendmail", "-f", _from, *recipient.split()]
+    run_command(cmd, 30, stdin=message)
     LOG.info("email sent!")
 
 def init_logger(info_filename='gpu_checker.log', error_filename='gpu_checker_error.log',
@@ -292,12 +408,18 @@ def init_logger(info_filename='gpu_checker.log', error_filename='gpu_checker_err
 
 def init_gpu_counts():
     global SLURM_GPU_COUNTS
-    command = r"sinfo --noheader -N  -o '%N|%G' | sort -u"
-    stdout, command_report = shell_command(command, 10)
+    # -o with a single unpadded separator rather than --Format, which pads every field to a
+    # fixed width and truncates long gres strings
+    command = ["sinfo", "--noheader", "-N", "-o", "%N|%G"]
+    stdout, command_report = run_command(command, 10)
+    gpu_counts = dict()
     for line in stdout.splitlines():
-        node, gres_str = line.split('|')
+        node, gres_str = line.split('|', 1)
+        # -N lists a node once per partition, its gres string has already been parsed
+        if node in gpu_counts:
+            continue
         if gres_str=="(null)":
-            SLURM_GPU_COUNTS[node] = 0
+            gpu_counts[node] = 0
             continue
         # example gres_str:
         # "gpu:tesla:2,gpu:kepler:2,mps:400,bandwidth:lustre:no_consume:4G"
@@ -306,7 +428,9 @@ def init_gpu_counts():
             gres_type,gres_data_str = gres.split(':',1)
             if gres_type == "gpu":
                 num_gpus += int(gres_data_str.split(':')[-1])
-        SLURM_GPU_COUNTS[node] = num_gpus
+        gpu_counts[node] = num_gpus
+    # swap in the new counts all at once, so no check ever sees a half filled dict
+    SLURM_GPU_COUNTS = gpu_counts
 
 def init_config():
     config = configparser.ConfigParser()
@@ -339,7 +463,9 @@ def init_config():
             "do_print_stdout_stderr" : "True"
         }
         config['misc'] = {
-            "post_check_wait_time_s" : "60",
+            "max_parallel_checks" : "10",
+            "sweep_interval_s" : "0",
+            "healthy_recheck_interval_s" : "0",
             "do_drain_nodes" : "False",
             "check_timeout_s" : "30"
         }
@@ -361,7 +487,17 @@ if __name__=="__main__":
     LOG.info("hello, world!")
 
     do_send_email = str_to_bool(config['email']['enabled'])
-    post_check_wait_time_s = int(config['misc']['post_check_wait_time_s'])
+    email_to = config['email']['to']
+    email_from = config['email']['from']
+    email_signature = config['email']['signature']
+    # config files written before max_parallel_checks existed don't have it
+    max_parallel_checks = config['misc'].getint('max_parallel_checks', fallback=10)
+    if 'post_check_wait_time_s' in config['misc']:
+        LOG.info("ignoring post_check_wait_time_s from config, nodes are checked in parallel "
+                 "now, see max_parallel_checks")
+    # also newer than most config files, 0 keeps the old check once and exit behavior
+    sweep_interval_s = config['misc'].getint('sweep_interval_s', fallback=0)
+    healthy_recheck_interval_s = config['misc'].getint('healthy_recheck_interval_s', fallback=0)
     do_drain_nodes = str_to_bool(config['misc']['do_drain_nodes'])
     check_timeout_s = int(config['misc']['check_timeout_s'])
 
@@ -374,48 +510,96 @@ if __name__=="__main__":
     exclude_nodes = parse_config_list(config['nodes']['exclude_nodes'], lowercase=True)
     ssh_user = config['ssh']['user'].strip()
     ssh_keyfilename = config['ssh']['keyfilename'].strip()
-
-    init_gpu_counts()
-    for node in find_slurm_nodes(partitions, include_nodes, exclude_nodes):
-        if not do_check_node(node, states_to_check, states_not_to_check, include_nodes):
-            continue
-        gpu_works, drain_message, check_report = check_gpu(node, ssh_user, ssh_keyfilename,
-                                                           timeout_s=check_timeout_s)
-        if gpu_works:
-            LOG.info(f"{node} works")
-            time.sleep(post_check_wait_time_s)
-            continue
-        LOG.error(f"{node} doesn't work!")
-        if do_drain_nodes:
-            try:
-                cmd = f"scontrol update nodename={node} state=drain reason=\"{drain_message}\""
-                stdout, drain_report = shell_command(cmd, 10)
-                drain_success = True
-            except subprocess.CalledProcessError as err:
-                drain_report = str(err)
-                drain_success = False
-        else:
-            drain_success = False
-            drain_report = "drain disabled in config"
-        if do_send_email:
-            if drain_success:
-                subject = f"{node} drained: {drain_message} (gpu-checker)"
-            else:
-                subject = f"{node} could be drained: {drain_message} (gpu-checker)"
-            full_report = multiline_str(
-                "gpu check:",
-                indent(check_report),
-                '',
-                "drain operation:",
-                indent(drain_report)
-            )
-            send_email(
-                config['email']['to'],
-                config['email']['from'],
-                subject,
-                full_report,
-                config['email']['signature'],
-            )
-        # each loop takes about 5 seconds on its own, most of the delay is the ssh command
-        LOG.info(f"sleeping {post_check_wait_time_s} seconds...")
-        time.sleep(post_check_wait_time_s)
+    ssh_key = load_private_key(ssh_keyfilename)
+
+    # each check takes about 5 seconds on its own, most of the delay is the ssh command
+    # so check many nodes at once, but not so many that sshd MaxStartups starts dropping us
+    # the same workers are reused for every sweep rather than starting new threads each time
+    executor = ThreadPoolExecutor(max_workers=max_parallel_checks)
+    last_passed = dict() # node -> time.monotonic() of the last check that passed
+    while True:
+        try:
+            init_gpu_counts()
+            nodes_to_check = []
+            nodes_backing_off = []
+            for node in find_slurm_nodes(partitions, include_nodes, exclude_nodes):
+                # a node that passed recently is left alone until healthy_recheck_interval_s is up
+                time_since_passed = time.monotonic() - last_passed.get(node, float("-inf"))
+                if time_since_passed < healthy_recheck_interval_s:
+                    LOG.info(f"checking node {node}?\t{False} because it passed "
+                             f"{int(time_since_passed)} seconds ago")
+                    nodes_backing_off.append(node)
+                    continue
+                if do_check_node(node, states_to_check, states_not_to_check, include_nodes):
+                    nodes_to_check.append(node)
+            check_results = list(executor.map(
+                lambda node: check_gpu(node, ssh_user, ssh_key, timeout_s=check_timeout_s),
+                nodes_to_check
+            ))
+            # drained, excluded, or gone from slurm: don't hold a connection open forever
+            # nodes skipped only because they passed recently will be checked again soon
+            close_ssh_clients(keep_nodes=set(nodes_to_check + nodes_backing_off))
+            failed_checks = dict() # drain message -> {node: check report}
+            for node, (gpu_works, drain_message, check_report) in zip(nodes_to_check,
+                                                                      check_results):
+                if gpu_works:
+                    LOG.info(f"{node} works")
+                    last_passed[node] = time.monotonic()
+                    continue
+                LOG.error(f"{node} doesn't work!")
+                last_passed.pop(node, None)
+                failed_checks.setdefault(drain_message, dict())[node] = check_report
+            # nodes that failed the same way share a reason
+            # so drain each group with one scontrol call
+            drained_nodes = []
+            undrained_nodes = []
+            email_sections = []
+            for drain_message, check_reports in failed_checks.items():
+                nodes = list(check_reports)
+                if do_drain_nodes:
+                    drain_success, drain_report = drain_nodes(nodes, drain_message)
+                else:
+                    drain_success = False
+                    drain_report = "drain disabled in config"
+                if drain_success:
+                    drained_nodes += nodes
+                else:
+                    undrained_nodes += nodes
+                # the reports are only read by whoever gets the email
+                if do_send_email:
+                    email_sections.append(multiline_str(
+                        f"{','.join(nodes)}: {drain_message}",
+                        *[multiline_str(f"{node} gpu check:", indent(check_report), '')
+                          for node, check_report in check_reports.items()],
+                        "drain operation:",
+                        indent(drain_report),
+                        ''
+                    ))
+            # one email per sweep no matter how many nodes failed
+            if do_send_email and (len(failed_checks) > 0):
+                subject_parts = []
+                if len(drained_nodes) > 0:
+                    subject_parts.append(f"{','.join(drained_nodes)} drained")
+                if len(undrained_nodes) > 0:
+                    subject_parts.append(f"{','.join(undrained_nodes)} could be drained")
+                send_email(
+                    email_to,
+                    email_from,
+                    f"{'; '.join(subject_parts)} (gpu-checker)",
+                    multiline_str(*email_sections),
+                    email_signature,
+                )
+        except (RuntimeError, subprocess.TimeoutExpired):
+            # a slurm command failing once shouldn't kill a checker that runs forever
+            # but when checking once, there's no next sweep to retry in
+            if sweep_interval_s <= 0:
+                raise
+            LOG.error(multiline_str("sweep failed, trying again next sweep:",
+                                    traceback.format_exc()))
+        # 0 sweep interval means check every node once and exit
+        if sweep_interval_s <= 0:
+            break
+        LOG.info(f"sleeping {sweep_interval_s} seconds...")
+        time.sleep(sweep_interval_s)
+    executor.shutdown()
+    close_ssh_clients()